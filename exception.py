@@ -7,12 +7,29 @@ class SendMessageFailed(ErrorNotToSend):
 
 
 class EmptyResponse(ErrorNotToSend):
-    pass
+    def __init__(self, response):
+        super().__init__(response)
+        self.response = response
+
+    def __str__(self):
+        return f'Ответ не содержит домашних работ. Пришло: {self.response}'
 
 
 class UnexpectedHTTPStatusCodeError(Exception):
+    def __init__(self, expected, got, reason=None):
+        super().__init__(expected, got, reason)
+        self.expected = expected
+        self.got = got
+        self.reason = reason
+
+    def __str__(self):
+        return (f'Ожидаемый ответ: {self.expected}. '
+                f'Полученный: {self.got} {self.reason}')
+
+
+class UnexpectedTypeError(TypeError):
     pass
 
 
-class UnexpectedTypeError(Exception):
+class APIRequestError(Exception):
     pass
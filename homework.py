@@ -1,18 +1,29 @@
+from collections import OrderedDict
+import hashlib
 from http import HTTPStatus
 import logging.config
 import os
+import random
+import re
+import select
+import signal
+import socket
 import sys
 import time
+from typing import List, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 import telegram
 
 from dotenv import load_dotenv
 
-from exception import (EmptyResponse,
+from exception import (APIRequestError,
+                       EmptyResponse,
                        ErrorNotToSend,
                        SendMessageFailed,
-                       UnexpectedHTTPStatusCodeError,)
+                       UnexpectedHTTPStatusCodeError,
+                       UnexpectedTypeError,)
 
 load_dotenv()
 
@@ -27,87 +38,126 @@ PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 ERROR_TOKEN = '9Rr0я'
+ERROR_CACHE_SIZE = 1024
+ERROR_CACHE = OrderedDict()
+VOLATILE_PATTERN = re.compile(r'0x[0-9a-fA-F]+|\d+')
 
 RETRY_TIME = 600
+RETRY_BASE_TIME = 5
+SEND_INTERVAL = 1.0
+_last_send_ts = 0.0
+_stop_signal = None
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+API_TIMEOUT = (5, 30)
+
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
 
 VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+STATUS_TEMPLATES = {
+    status: 'Изменился статус проверки работы "%s". ' + verdict
+    for status, verdict in VERDICTS.items()
+}
 
 
-def send_message(bot: telegram.Bot,
-                 message: str,) -> None:
-    """Отправляет сообщение в Telegram чат."""
+def _send_to_chat(bot: telegram.Bot,
+                  message: str,
+                  disable_notification: bool,) -> None:
+    """Отправляет сообщение в Telegram чат с учетом лимита Telegram."""
+    global _last_send_ts
     logger.info('Попытка отправить сообщение в чат')
+    wait = SEND_INTERVAL - (time.monotonic() - _last_send_ts)
+    if wait > 0:
+        time.sleep(wait)
+    send_params = {
+        'text': message,
+        'disable_notification': disable_notification,
+    }
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, text=message)
-        logger.info(f'Новое сообщение в чате: {message}')
+        try:
+            bot.send_message(TELEGRAM_CHAT_ID, **send_params)
+        except telegram.error.RetryAfter as error:
+            logger.warning('Превышен лимит Telegram, повтор через %s с',
+                           error.retry_after)
+            time.sleep(error.retry_after)
+            bot.send_message(TELEGRAM_CHAT_ID, **send_params)
+        logger.info('Новое сообщение в чате: %s', message)
     except telegram.TelegramError as error:
         logger.error(
-            'Попытка отправить сообщение об ошибке не удалась'
-            f'{type(error).__name__}: {error}'
+            'Попытка отправить сообщение об ошибке не удалась %s: %s',
+            type(error).__name__, error
         )
     except Exception as error:
         message = f'Не удалось отправить сообщение: {error}'
         raise SendMessageFailed(message)
+    finally:
+        _last_send_ts = time.monotonic()
+
+
+def send_message(bot: telegram.Bot,
+                 message: str,) -> None:
+    """Отправляет сообщение в Telegram чат."""
+    _send_to_chat(bot, message, disable_notification=False)
+
+
+def send_error(bot: telegram.Bot,
+               message: str,) -> None:
+    """Отправляет сообщение об ошибке в Telegram чат без уведомления."""
+    _send_to_chat(bot, message, disable_notification=True)
 
 
 def get_api_answer(current_time: int) -> requests:
     """Получает ответ API и проверяет на корректность."""
     logger.info('Попытка запроса к API')
-    timestamp = current_time or time.time()
-    params = {'from_date': timestamp}
-    api_params = {
-        'url': ENDPOINT,
-        'headers': HEADERS,
-        'params': params,
-    }
+    timestamp = current_time or int(time.time())
     try:
         logger.info('Запрос к API')
-        response = requests.get(**api_params)
+        response = SESSION.get(ENDPOINT, headers=HEADERS,
+                               params={'from_date': timestamp},
+                               timeout=API_TIMEOUT)
         if response.status_code == HTTPStatus.OK:
-            logger.info(f'Запрос к API прошел успешно: {response.status_code}')
+            logger.info('Запрос к API прошел успешно: %s',
+                        response.status_code)
             return response.json()
         else:
-            logger.exception(f'Ошибка при запросе к эндпоинту {ENDPOINT}.')
-            message = (
-                f'Ожидаемый ответ: {HTTPStatus.OK}. '
-                f'Полученный: {response.status_code} {response.reason}\n'
+            logger.exception('Ошибка при запросе к эндпоинту %s.', ENDPOINT)
+            raise UnexpectedHTTPStatusCodeError(
+                HTTPStatus.OK, response.status_code, response.reason
             )
-            raise UnexpectedHTTPStatusCodeError(message)
-    except ConnectionError as error:
-        message = (f'{error}'', переданные переменные:\n'
-                   '{url}\nAuthorization: {headers[Authorization]:.5}\n'
-                   '{params}')
-        raise ConnectionError(message)
+    except (requests.ConnectionError, requests.Timeout) as error:
+        message = (f'{error}, переданные переменные:\n'
+                   f'{ENDPOINT}\n'
+                   f'Authorization: {HEADERS["Authorization"]:.5}\n'
+                   f'from_date: {timestamp}')
+        raise APIRequestError(message)
 
 
 def check_response(response: dict) -> list:
     """Проверяет ответ API на корректность."""
     logger.info('Проверка ответа API на корректность - содержит list')
-    if not isinstance(response, dict):
+    try:
+        homeworks = response['homeworks']
+    except KeyError:
+        raise EmptyResponse(response)
+    except TypeError:
         message = (
             'От сервера не пришли необходимые данные в формате dict.'
             f'Пришел {type(response)}'
         )
-        raise TypeError(message)
-    if not isinstance(response.get('homeworks'), list):
-        received_data = response.get('homeworks')
+        raise UnexpectedTypeError(message)
+    if not isinstance(homeworks, list):
         message = (
             'От сервера не пришли необходимые данные в формате list.'
-            f'Пришел {type(received_data)}'
+            f'Пришел {type(homeworks)}'
         )
-        raise TypeError(message)
-    if 'homeworks' not in response:
-        message = ('Ответ не содержит домашних работ.'
-                   f'Пришло: {response}')
-        raise EmptyResponse(message)
+        raise UnexpectedTypeError(message)
     logger.info('Проверка пройдена')
-    return response.get('homeworks')
+    return homeworks
 
 
 def parse_status(homework: dict) -> str:
@@ -126,56 +176,145 @@ def parse_status(homework: dict) -> str:
             f'Статус работы: {status}'
         )
         raise NameError(message)
-    return (
-        'Изменился статус проверки работы "{homework_name}". {verdict}'
-        .format(homework_name=homework_name, verdict=VERDICTS[status])
-    )
+    return STATUS_TEMPLATES[status] % homework_name
+
+
+def get_status_messages(response: dict) -> Tuple[List[str],
+                                                 List[Exception]]:
+    """Проверяет ответ API и готовит сообщения о статусах всех работ.
+    Работы с некорректными данными пропускаются, ошибки по ним
+    возвращаются отдельно, чтобы не блокировать остальные статусы.
+    """
+    messages = []
+    errors = []
+    for homework in check_response(response):
+        if not isinstance(homework, dict):
+            message = (
+                'Пришли данные домашней работы не в формате dict.'
+                f'Пришел {type(homework)}'
+            )
+            errors.append(UnexpectedTypeError(message))
+            continue
+        try:
+            messages.append(parse_status(homework))
+        except (KeyError, NameError) as error:
+            errors.append(error)
+    return messages, errors
 
 
 def check_tokens() -> bool:
     """Проверяет доступность переменных окружения."""
-    return all([PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID])
+    if PRACTICUM_TOKEN and TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
+        return True
+    tokens = (
+        ('PRACTICUM_TOKEN', PRACTICUM_TOKEN),
+        ('TELEGRAM_TOKEN', TELEGRAM_TOKEN),
+        ('TELEGRAM_CHAT_ID', TELEGRAM_CHAT_ID),
+    )
+    for name, value in tokens:
+        if not value:
+            logger.critical('Отсутствует переменная окружения: %s', name)
+    return False
+
+
+def exception_check(error: str) -> bool:
+    """Проверяет, что сообщение об ошибке еще не отправлялось.
+    Ошибки сравниваются по хэшу текста без чисел и адресов объектов
+    (таймстемпы, коды, 0x7f...),
+    кэш ограничен ERROR_CACHE_SIZE, старые записи вытесняются.
+    """
+    canonical = VOLATILE_PATTERN.sub('#', error)
+    digest = hashlib.blake2b(canonical.encode(), digest_size=8).digest()
+    if digest in ERROR_CACHE:
+        return False
+    ERROR_CACHE[digest] = None
+    if len(ERROR_CACHE) > ERROR_CACHE_SIZE:
+        ERROR_CACHE.popitem(last=False)
+    return True
+
+
+def report_error(bot: telegram.Bot, error: Exception) -> None:
+    """Логирует ошибку и однократно сообщает о ней в Telegram чат."""
+    message = f'{type(error).__name__}: {error}. {ERROR_TOKEN}'
+    logger.error(message)
+    if exception_check(message):
+        send_error(bot, message)
+
+
+def get_retry_delay(fail_count: int) -> float:
+    """Вычисляет паузу до следующего запроса к API.
+    После успешного запроса - RETRY_TIME, после ошибок - экспоненциальная
+    задержка со случайным разбросом (full jitter), не больше RETRY_TIME.
+    """
+    if not fail_count:
+        return RETRY_TIME
+    return random.uniform(
+        0, min(RETRY_TIME, RETRY_BASE_TIME * 2 ** fail_count)
+    )
+
+
+def stop_polling(signum, frame) -> None:
+    """Запоминает сигнал завершения, опрос API остановится после паузы.
+    Обработчик не берет блокировок: main() просыпается через wakeup fd.
+    """
+    global _stop_signal
+    _stop_signal = signum
+
+
+def setup_stop_signals() -> Tuple[socket.socket, socket.socket]:
+    """Устанавливает обработчики SIGTERM и SIGINT.
+    Возвращает пару сокетов: первый становится читаемым при сигнале.
+    """
+    wakeup_reader, wakeup_writer = socket.socketpair()
+    wakeup_reader.setblocking(False)
+    wakeup_writer.setblocking(False)
+    signal.set_wakeup_fd(wakeup_writer.fileno())
+    signal.signal(signal.SIGTERM, stop_polling)
+    signal.signal(signal.SIGINT, stop_polling)
+    return wakeup_reader, wakeup_writer
+
+
+def wait_for_stop(wakeup_reader: socket.socket, timeout: float) -> None:
+    """Ждет timeout секунд или до получения сигнала завершения."""
+    if select.select([wakeup_reader], [], [], timeout)[0]:
+        try:
+            wakeup_reader.recv(1024)
+        except BlockingIOError:
+            pass
 
 
 def main():
     """Основная логика работы бота."""
     current_time = int(time.time())
-    prev_report = {}
-    current_report = {}
+    fail_count = 0
     if not check_tokens():
-        message = 'Переменные-токены недоступны в окружении'
-        logger.critical(message)
-        sys.exit(message)
+        sys.exit('Переменные-токены недоступны в окружении')
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    while True:
+    wakeup_reader, wakeup_writer = setup_stop_signals()
+    while _stop_signal is None:
         try:
             response = get_api_answer(current_time)
-            homeworks = check_response(response)
-            if homeworks:
-                homework = homeworks[0]
-                message = parse_status(homework)
-                current_report['message'] = message
-            else:
-                logger.debug('Обновлений нет')
-            if current_report != prev_report:
+            messages, errors = get_status_messages(response)
+            for message in messages:
                 logger.debug('Получен новый статус')
-                prev_report = current_report.copy()
-                current_time = int(time.time())
                 send_message(bot, message)
-            else:
-                logger.debug('Обновлений нет')
+            for error in errors:
+                report_error(bot, error)
+            current_time = response.get('current_date')
+            if not isinstance(current_time, int):
+                current_time = int(time.time())
         except ErrorNotToSend as error:
-            message = f'{type(error).__name__}: {error}'
-            logger.error(message)
+            fail_count += 1
+            logger.error('%s: %s', type(error).__name__, error)
         except Exception as error:
-            message = f'{type(error).__name__}: {error}. {ERROR_TOKEN}'
-            current_report['message'] = message
-            logger.error(message)
-            if current_report != prev_report:
-                prev_report = current_report.copy()
-                send_message(bot, message)
-        finally:
-            time.sleep(RETRY_TIME)
+            fail_count += 1
+            report_error(bot, error)
+        else:
+            fail_count = 0
+            ERROR_CACHE.clear()
+        wait_for_stop(wakeup_reader, get_retry_delay(fail_count))
+    logger.info('Получен сигнал %s, завершение работы', _stop_signal)
+    SESSION.close()
 
 
 if __name__ == '__main__':
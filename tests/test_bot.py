@@ -1,6 +1,9 @@
 import os
+import signal
+import time
 from http import HTTPStatus
 
+import pytest
 import requests
 import telegram
 import utils
@@ -73,6 +76,47 @@ class MockTelegramBot:
         return self.random_timestamp
 
 
+def run_main(homework, monkeypatch, responses):
+    """Runs main() for one poll per response.
+    :return: `from_date` of every poll and texts sent to the chat
+    """
+    from_dates = []
+    sent = []
+    polls = len(responses)
+    responses = iter(responses)
+
+    def mock_get_api_answer(current_time):
+        from_dates.append(current_time)
+        return next(responses)
+
+    class MockBot:
+
+        def __init__(self, token=None, **kwargs):
+            pass
+
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            sent.append(text)
+
+    monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'sometoken')
+    monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '1234:abcdefg')
+    monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 12345)
+    monkeypatch.setattr(telegram, 'Bot', MockBot)
+    monkeypatch.setattr(homework, 'get_api_answer', mock_get_api_answer)
+    def mock_wait_for_stop(wakeup_reader, timeout):
+        if len(from_dates) >= polls:
+            homework._stop_signal = homework.signal.SIGTERM
+
+    monkeypatch.setattr(homework, '_stop_signal', None)
+    monkeypatch.setattr(homework, 'setup_stop_signals', lambda: (None, None))
+    monkeypatch.setattr(homework, 'wait_for_stop', mock_wait_for_stop)
+    monkeypatch.setattr(homework.SESSION, 'close', lambda: None)
+    monkeypatch.setattr(homework, 'SEND_INTERVAL', 0)
+    monkeypatch.setattr(homework, '_last_send_ts', 0.0)
+    monkeypatch.setattr(homework, 'ERROR_CACHE', homework.OrderedDict())
+    homework.main()
+    return from_dates, sent
+
+
 class TestHomework:
     HOMEWORK_STATUSES = {
         'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -186,10 +230,10 @@ class TestHomework:
                 current_timestamp=current_timestamp, **kwargs
             )
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'get_api_answer'
         utils.check_function(homework, func_name, 1)
 
@@ -232,10 +276,10 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_500_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_500_response_get)
+
         func_name = 'get_api_answer'
         try:
             homework.get_api_answer(current_timestamp)
@@ -315,10 +359,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         status = homework.check_response(response)
@@ -352,10 +396,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -400,10 +444,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -448,10 +492,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'parse_status'
         response = homework.get_api_answer(current_timestamp)
         homeworks = homework.check_response(response)
@@ -484,10 +528,10 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_no_homeworks_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_no_homeworks_response_get)
+
         func_name = 'check_response'
         result = homework.get_api_answer(current_timestamp)
         try:
@@ -525,10 +569,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         try:
@@ -565,10 +609,10 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         response = homework.get_api_answer(current_timestamp)
         try:
@@ -599,10 +643,10 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_empty_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_empty_response_get)
+
         func_name = 'check_response'
         result = homework.get_api_answer(current_timestamp)
         try:
@@ -626,10 +670,10 @@ class TestHomework:
             )
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
-
         import homework
 
+        monkeypatch.setattr(homework.SESSION, 'get', mock_response_get)
+
         func_name = 'check_response'
         try:
             homework.get_api_answer(current_timestamp)
@@ -640,3 +684,285 @@ class TestHomework:
                 f'Убедитесь, что в функции `{func_name}` обрабатываете ситуацию, '
                 'когда API возвращает код, отличный от 200'
             )
+
+    def test_api_connection_timeout(self, monkeypatch, current_timestamp):
+        def mock_timeout_get(*args, **kwargs):
+            assert 'timeout' in kwargs, (
+                'Проверьте, что запрос к API выполняется с таймаутом'
+            )
+            raise requests.Timeout('Read timed out')
+
+        import homework
+
+        monkeypatch.setattr(homework.SESSION, 'get', mock_timeout_get)
+
+        func_name = 'get_api_answer'
+        try:
+            homework.get_api_answer(current_timestamp)
+        except homework.APIRequestError:
+            pass
+        else:
+            assert False, (
+                f'Убедитесь, что в функции `{func_name}` обрабатываете ситуацию, '
+                'когда запрос к API превышает таймаут'
+            )
+
+    def test_get_retry_delay(self):
+        import homework
+
+        func_name = 'get_retry_delay'
+        utils.check_function(homework, func_name, 1)
+        assert homework.get_retry_delay(0) == homework.RETRY_TIME, (
+            f'Убедитесь, что функция `{func_name}` после успешного запроса '
+            'возвращает `RETRY_TIME`'
+        )
+        for fail_count in range(1, 20):
+            delay = homework.get_retry_delay(fail_count)
+            limit = min(homework.RETRY_TIME,
+                        homework.RETRY_BASE_TIME * 2 ** fail_count)
+            assert 0 <= delay <= limit, (
+                f'Убедитесь, что функция `{func_name}` при ошибках '
+                'возвращает задержку не больше экспоненциального предела'
+            )
+
+    def test_exception_check(self, monkeypatch):
+        import homework
+
+        func_name = 'exception_check'
+        utils.check_function(homework, func_name, 1)
+        monkeypatch.setattr(homework, 'ERROR_CACHE', homework.OrderedDict())
+        monkeypatch.setattr(homework, 'ERROR_CACHE_SIZE', 2)
+        assert homework.exception_check('first'), (
+            f'Убедитесь, что функция `{func_name}` возвращает True '
+            'для новой ошибки'
+        )
+        assert not homework.exception_check('first'), (
+            f'Убедитесь, что функция `{func_name}` возвращает False '
+            'для уже отправленной ошибки'
+        )
+        homework.exception_check('second')
+        homework.exception_check('third')
+        assert len(homework.ERROR_CACHE) == 2, (
+            f'Убедитесь, что функция `{func_name}` ограничивает размер кэша'
+        )
+        assert homework.exception_check('first'), (
+            f'Убедитесь, что функция `{func_name}` вытесняет старые ошибки'
+        )
+        assert homework.exception_check('timeout from_date: 1000198000'), (
+            f'Убедитесь, что функция `{func_name}` возвращает True '
+            'для новой ошибки'
+        )
+        assert not homework.exception_check('timeout from_date: 1000198991'), (
+            f'Убедитесь, что функция `{func_name}` не различает ошибки, '
+            'отличающиеся только числами'
+        )
+        connection_error = (
+            "HTTPSConnectionPool(host='practicum.yandex.ru', port=443): "
+            "Max retries exceeded with url: /api/user_api/homework_statuses/"
+            " (Caused by NewConnectionError('<urllib3.connection."
+            "HTTPSConnection object at {}>: Failed to establish a new "
+            "connection: [Errno 111] Connection refused'))"
+        )
+        assert homework.exception_check(
+            connection_error.format('0x7faa1c2b3d50')
+        ), (
+            f'Убедитесь, что функция `{func_name}` возвращает True '
+            'для новой ошибки'
+        )
+        assert not homework.exception_check(
+            connection_error.format('0x7fab9e0fcd90')
+        ), (
+            f'Убедитесь, что функция `{func_name}` не различает ошибки, '
+            'отличающиеся только адресами объектов'
+        )
+
+    def test_send_message_retry_after(self, monkeypatch):
+        import homework
+
+        class RateLimitedBot:
+            calls = 0
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                RateLimitedBot.calls += 1
+                if RateLimitedBot.calls == 1:
+                    raise telegram.error.RetryAfter(0)
+
+        monkeypatch.setattr(homework, '_last_send_ts', 0.0)
+        monkeypatch.setattr(homework.time, 'sleep', lambda seconds: None)
+        homework.send_message(RateLimitedBot(), 'message')
+        assert RateLimitedBot.calls == 2, (
+            'Убедитесь, что функция `send_message` повторяет отправку '
+            'после ошибки `RetryAfter`'
+        )
+
+    def test_send_message_interval(self, monkeypatch, random_timestamp):
+        import homework
+
+        clock = [1000.0]
+        sleeps = []
+
+        def mock_sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        monkeypatch.setattr(homework, '_last_send_ts', 0.0)
+        monkeypatch.setattr(homework.time, 'monotonic', lambda: clock[0])
+        monkeypatch.setattr(homework.time, 'sleep', mock_sleep)
+        bot = MockTelegramBot(token='1234:abcdefg',
+                              random_timestamp=random_timestamp)
+        homework.send_message(bot, 'first')
+        clock[0] += 0.25
+        homework.send_message(bot, 'second')
+        assert sleeps == [homework.SEND_INTERVAL - 0.25], (
+            'Убедитесь, что функция `send_message` выдерживает интервал '
+            '`SEND_INTERVAL` между сообщениями'
+        )
+        clock[0] += homework.SEND_INTERVAL
+        homework.send_message(bot, 'third')
+        assert len(sleeps) == 1, (
+            'Убедитесь, что функция `send_message` не ждет, если интервал '
+            '`SEND_INTERVAL` уже прошел'
+        )
+
+    def test_send_error_without_notification(self, monkeypatch):
+        import homework
+
+        sent = []
+
+        class MockBot:
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sent.append(kwargs.get('disable_notification'))
+
+        monkeypatch.setattr(homework, '_last_send_ts', 0.0)
+        monkeypatch.setattr(homework, 'SEND_INTERVAL', 0)
+        homework.send_message(MockBot(), 'status')
+        homework.send_error(MockBot(), 'error')
+        assert sent == [False, True], (
+            'Убедитесь, что сообщения о статусе отправляются с уведомлением, '
+            'а сообщения об ошибках - без уведомления'
+        )
+
+    def test_check_response_missing_homeworks_not_sent(self,
+                                                       random_timestamp):
+        import homework
+
+        for response in ({'current_date': random_timestamp}, {}):
+            with pytest.raises(homework.EmptyResponse):
+                homework.check_response(response)
+        assert issubclass(homework.EmptyResponse, homework.ErrorNotToSend), (
+            'Убедитесь, что ошибка об отсутствии ключа `homeworks` '
+            'не отправляется в чат'
+        )
+
+    def test_check_response_unexpected_type(self, random_timestamp):
+        import homework
+
+        responses = (
+            [{'homeworks': [], 'current_date': random_timestamp}],
+            {'homeworks': {'homework_name': 'hw123', 'status': 'approved'},
+             'current_date': random_timestamp},
+        )
+        for response in responses:
+            with pytest.raises(homework.UnexpectedTypeError):
+                homework.check_response(response)
+
+    def test_get_status_messages(self, random_timestamp):
+        import homework
+
+        func_name = 'get_status_messages'
+        utils.check_function(homework, func_name, 1)
+        response = {
+            'homeworks': [
+                {'homework_name': 'hw1', 'status': 'approved'},
+                {'homework_name': 'hw2', 'status': 'unknown'},
+                None,
+                'hw4',
+                {'homework_name': 'hw3', 'status': 'rejected'},
+            ],
+            'current_date': random_timestamp,
+        }
+        messages, errors = homework.get_status_messages(response)
+        assert messages == [
+            homework.parse_status(response['homeworks'][0]),
+            homework.parse_status(response['homeworks'][4]),
+        ], (
+            f'Убедитесь, что функция `{func_name}` возвращает сообщение '
+            'для каждой корректной домашней работы из ответа API'
+        )
+        assert len(errors) == 3, (
+            f'Убедитесь, что функция `{func_name}` возвращает ошибку '
+            'для каждой домашней работы с некорректными данными'
+        )
+
+    def test_main_skips_invalid_homework(self, monkeypatch,
+                                         random_timestamp):
+        import homework
+
+        homeworks = [
+            {'homework_name': 'hw1', 'status': 'approved'},
+            {'homework_name': 'hw2', 'status': 'unknown'},
+            None,
+        ]
+        from_dates, sent = run_main(homework, monkeypatch, [
+            {'homeworks': homeworks, 'current_date': random_timestamp},
+            {'homeworks': [], 'current_date': random_timestamp + 1},
+            {'homeworks': [], 'current_date': random_timestamp + 2},
+        ])
+        assert sent.count(homework.parse_status(homeworks[0])) == 1, (
+            'Убедитесь, что в `main()` статус корректной работы отправляется '
+            'один раз, даже если другая работа в ответе некорректна'
+        )
+        assert len(sent) == 3 and all(
+            message.endswith(homework.ERROR_TOKEN) for message in sent[1:]
+        ), (
+            'Убедитесь, что в `main()` об ошибке в некорректной работе '
+            'сообщается в чат'
+        )
+        assert from_dates[1] == random_timestamp, (
+            'Убедитесь, что в `main()` `from_date` сдвигается, даже если '
+            'одна из работ в ответе некорректна'
+        )
+
+    def test_stop_signal_wakes_up_wait(self, monkeypatch):
+        import homework
+
+        handlers = {sig: signal.getsignal(sig)
+                    for sig in (signal.SIGTERM, signal.SIGINT)}
+        monkeypatch.setattr(homework, '_stop_signal', None)
+        wakeup_reader, wakeup_writer = homework.setup_stop_signals()
+        try:
+            started = time.monotonic()
+            os.kill(os.getpid(), signal.SIGTERM)
+            homework.wait_for_stop(wakeup_reader, 5)
+            assert time.monotonic() - started < 1, (
+                'Убедитесь, что сигнал завершения прерывает паузу '
+                'между запросами к API'
+            )
+            assert homework._stop_signal == signal.SIGTERM, (
+                'Убедитесь, что обработчик запоминает сигнал завершения'
+            )
+        finally:
+            signal.set_wakeup_fd(-1)
+            for sig, handler in handlers.items():
+                signal.signal(sig, handler)
+            wakeup_reader.close()
+            wakeup_writer.close()
+
+    def test_main_from_date_follows_current_date(self, monkeypatch,
+                                                 random_timestamp):
+        import homework
+
+        from_dates, _ = run_main(homework, monkeypatch, [
+            {'homeworks': [], 'current_date': random_timestamp},
+            {'homeworks': []},
+            {'homeworks': []},
+        ])
+        assert from_dates[1] == random_timestamp, (
+            'Убедитесь, что в `main()` следующий запрос к API использует '
+            '`current_date` из предыдущего ответа'
+        )
+        assert from_dates[2] > random_timestamp, (
+            'Убедитесь, что в `main()` при отсутствии `current_date` '
+            '`from_date` не остается прежним'
+        )